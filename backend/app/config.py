@@ -8,6 +8,10 @@ class Settings(BaseSettings):
     
     # Storage
     data_dir: str = "./data"
+
+    # Rate limiting - point at a shared Redis in production so limits
+    # survive multiple workers and serverless cold starts
+    redis_url: str = "memory://"
     
     # Server
     port: int = 8001
@@ -0,0 +1,14 @@
+"""
+Shared rate limiter - a single instance so the routes that count hits and
+the 429 handler that reports window stats read the same storage.
+"""
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# Uses IP address for tracking; counters live in Redis when configured so
+# every worker/instance shares the same limits
+limiter = Limiter(key_func=get_remote_address, storage_uri=settings.redis_url, headers_enabled=True)
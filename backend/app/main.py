@@ -1,23 +1,22 @@
+import re
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from fastapi.responses import ORJSONResponse
 from slowapi.errors import RateLimitExceeded
 
 from app.config import get_settings
+from app.limiter import limiter
 from app.routes import contracts
 
 settings = get_settings()
 
-# Initialize rate limiter - uses IP address for tracking
-limiter = Limiter(key_func=get_remote_address)
-
 # Create FastAPI app
 app = FastAPI(
     title="Influract API",
     description="Contract analyzer for content creators - Turn legal jargon into actionable insights",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add limiter to app state
@@ -27,7 +26,7 @@ app.state.limiter = limiter
 # Custom rate limit exceeded handler with friendly message
 @app.exception_handler(RateLimitExceeded)
 async def custom_rate_limit_handler(request: Request, exc: RateLimitExceeded):
-    return JSONResponse(
+    response = ORJSONResponse(
         status_code=429,
         content={
             "error": "rate_limit_exceeded",
@@ -36,19 +35,31 @@ async def custom_rate_limit_handler(request: Request, exc: RateLimitExceeded):
             "retry_after": "1 hour"
         },
         headers={
-            "Access-Control-Allow-Origin": "*",
-            "Retry-After": "3600"
+            "Retry-After": "3600",
+            "RateLimit-Policy": "10;w=3600"
         }
     )
-
-
-# CORS middleware - allow all origins for serverless
+    # Attach the X-RateLimit-Limit/Remaining/Reset headers slowapi computed
+    # so well-behaved clients can back off instead of retrying blind
+    view_rate_limit = getattr(request.state, "view_rate_limit", None)
+    if view_rate_limit:
+        response = request.app.state.limiter._inject_headers(response, view_rate_limit)
+    return response
+
+
+# CORS middleware - regex whitelist covering local dev and the configured
+# frontend. Starlette compiles the pattern once, so matching is a single
+# re.match per request instead of a list scan, and the explicit method/header
+# sets let it return static strings instead of echoing request headers.
+# max_age lets browsers cache the preflight response for 24h,
+# saving one OPTIONS round trip per analyze/generate-email call
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=False,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origin_regex=rf"^(https?://localhost:(3000|3001)|{re.escape(settings.frontend_url)})$",
+    allow_credentials=True,
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,
 )
 
 # Register routes
@@ -70,16 +81,3 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
-
-# Handle OPTIONS preflight requests
-@app.options("/{path:path}")
-async def options_handler(request: Request):
-    return JSONResponse(
-        content={},
-        headers={
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type, Authorization",
-        }
-    )
-
@@ -1,26 +1,43 @@
 """
 Contract analysis API routes.
 """
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request, Response
+import io
+import tempfile
+import threading
 import uuid
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from cachetools import TTLCache
 
+from app.limiter import limiter
 from app.services.contract_service import analyze_contract, generate_negotiation_email
 
 router = APIRouter()
 
-# Rate limiter for this router - 10 requests per hour per IP
-limiter = Limiter(key_func=get_remote_address)
+# In-memory storage for serverless (temporary, clears on cold start).
+# Bounded and expiring after 1h so long-lived instances don't leak
+# memory or retain old analyses. TTLCache isn't thread-safe, hence the lock.
+_temp_storage: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+_storage_lock = threading.Lock()
 
-# In-memory storage for serverless (temporary, clears on cold start)
-_temp_storage: dict = {}
+# Uploads up to this size stay in memory; larger files spill to disk
+SPOOL_MAX_SIZE = 2 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Reject anything bigger than this before parsing (contracts are small)
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+
+# File signatures - a renamed file fails here instead of deep inside pypdf
+_MAGIC_BYTES = {
+    '.pdf': b'%PDF',
+    '.docx': b'PK\x03\x04',  # DOCX is a ZIP container
+}
 
 
 @router.post("/analyze")
 @limiter.limit("10/hour")
 async def analyze_contract_endpoint(
     request: Request,
+    response: Response,
     file: UploadFile = File(...),
     country: str = Form(default="United States")
 ):
@@ -40,27 +57,54 @@ async def analyze_contract_endpoint(
             detail=f"Unsupported file type. Allowed: {', '.join(allowed_extensions)}"
         )
     
-    # Read file content
-    try:
-        file_bytes = await file.read()
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to read file: {str(e)}")
-    
-    if len(file_bytes) == 0:
-        raise HTTPException(status_code=400, detail="Uploaded file is empty")
-    
-    # Analyze contract
-    try:
-        analysis = await analyze_contract(file_bytes, filename, country)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    # Reject oversized uploads before touching the body
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="File too large. Maximum size is 5 MB.")
+
+    # Stream file content into a spooled temp file instead of buffering
+    # the whole upload in memory; the with block closes it on every exit,
+    # including the early-rejection HTTPExceptions below
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+        total_bytes = 0
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                if total_bytes == 0:
+                    # Check the file signature on the first chunk so renamed or
+                    # malformed files never reach the parsers (or Gemini)
+                    for ext, magic in _MAGIC_BYTES.items():
+                        if filename.lower().endswith(ext) and not chunk.startswith(magic):
+                            raise HTTPException(
+                                status_code=400,
+                                detail=f"File doesn't look like a valid {ext[1:].upper()} file"
+                            )
+                total_bytes += len(chunk)
+                if total_bytes > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="File too large. Maximum size is 5 MB.")
+                spool.write(chunk)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to read file: {str(e)}")
+
+        if spool.tell() == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+
+        spool.seek(0)
+
+        # Analyze contract
+        try:
+            analysis = await analyze_contract(spool, filename, country)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
     
     # Store in memory temporarily
     analysis_id = str(uuid.uuid4())
     analysis["id"] = analysis_id
-    _temp_storage[analysis_id] = analysis
+    with _storage_lock:
+        _temp_storage[analysis_id] = analysis
     
     return {
         "id": analysis_id,
@@ -72,6 +116,7 @@ async def analyze_contract_endpoint(
 @limiter.limit("10/hour")
 async def analyze_text_endpoint(
     request: Request,
+    response: Response,
     text: str = Form(...),
     country: str = Form(default="United States")
 ):
@@ -86,8 +131,8 @@ async def analyze_text_endpoint(
     
     try:
         analysis = await analyze_contract(
-            text.encode('utf-8'), 
-            "pasted_contract.txt", 
+            io.BytesIO(text.encode('utf-8')),
+            "pasted_contract.txt",
             country
         )
     except ValueError as e:
@@ -98,7 +143,8 @@ async def analyze_text_endpoint(
     # Store in memory temporarily
     analysis_id = str(uuid.uuid4())
     analysis["id"] = analysis_id
-    _temp_storage[analysis_id] = analysis
+    with _storage_lock:
+        _temp_storage[analysis_id] = analysis
     
     return {
         "id": analysis_id,
@@ -109,7 +155,8 @@ async def analyze_text_endpoint(
 @router.get("/{analysis_id}")
 async def get_analysis_endpoint(analysis_id: str):
     """Get a saved analysis by ID."""
-    analysis = _temp_storage.get(analysis_id)
+    with _storage_lock:
+        analysis = _temp_storage.get(analysis_id)
     
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found or expired")
@@ -120,7 +167,8 @@ async def get_analysis_endpoint(analysis_id: str):
 @router.post("/{analysis_id}/generate-email")
 async def generate_email_endpoint(analysis_id: str):
     """Generate a negotiation email based on the analysis."""
-    analysis = _temp_storage.get(analysis_id)
+    with _storage_lock:
+        analysis = _temp_storage.get(analysis_id)
     
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found or expired")
@@ -2,13 +2,30 @@
 Contract Analysis Service using Gemini 2.5 Flash.
 Extracts text from contracts and analyzes clauses for creator risks.
 """
-import io
-import re
-import json
-from typing import Dict, Any
+import asyncio
+import hashlib
+import itertools
+import threading
+from typing import Dict, Any, IO, Optional
+
+import anyio.to_thread
+import orjson
+from cachetools import TTLCache
 import google.generativeai as genai
 from docx import Document
 
+# C-backed PDF extraction, 5-20x faster than pypdf; optional since its
+# prebuilt wheel may be missing on some platforms
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# PDFium itself is not thread-safe, and extraction runs on anyio worker
+# threads - serialize every call into the library (it's fast enough that
+# queueing is cheaper than a native crash)
+_pdfium_lock = threading.Lock()
+
 from app.config import get_settings
 
 settings = get_settings()
@@ -16,44 +33,99 @@ settings = get_settings()
 # Configure Gemini
 genai.configure(api_key=settings.gemini_api_key)
 
+# Contract text beyond this is truncated before prompting, so extraction
+# can stop early once it has enough
+MAX_PROMPT_CHARS = 15000
+
+# Shared model instance - constructing one per request allocates a new session
+_model = genai.GenerativeModel('gemini-2.0-flash')
+
+# Cache of Gemini analyses keyed by contract-text hash, so re-uploading or
+# re-pasting the same contract (very common while users iterate) skips the
+# LLM call. Entries expire after an hour to match the retention story
+# everywhere else. Per-key locks coalesce concurrent duplicates onto one call.
+_ANALYSIS_CACHE: TTLCache = TTLCache(maxsize=256, ttl=3600)
+# key -> [lock, refcount]; the count tracks coroutines using the lock so the
+# entry is only removed once the last of them leaves
+_analysis_locks: Dict[str, list] = {}
+
+def _extract_pdf_pdfium(file_obj: IO[bytes]) -> str:
+    """Extract text with pypdfium2, stopping once the prompt cap is covered."""
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(file_obj)
+        try:
+            parts = []
+            total = 0
+            for page in pdf:
+                t = page.get_textpage().get_text_range()
+                parts.append(t)
+                total += len(t) + 1
+                if total >= MAX_PROMPT_CHARS:
+                    break
+            return "\n".join(parts)
+        finally:
+            pdf.close()
+
+
+def extract_text_from_pdf(file_obj: IO[bytes]) -> str:
+    """Extract text from PDF - pypdfium2 when available, else pypdf."""
+    if pdfium is not None:
+        try:
+            return _extract_pdf_pdfium(file_obj)
+        except Exception:
+            # Fall back to pypdf on documents pdfium can't open
+            file_obj.seek(0)
+    return _extract_pdf_pypdf(file_obj)
 
-def extract_text_from_pdf(file_bytes: bytes) -> str:
+
+def _extract_pdf_pypdf(file_obj: IO[bytes]) -> str:
     """Extract text from PDF using pypdf (pure Python, serverless compatible)."""
     try:
         from pypdf import PdfReader
-        reader = PdfReader(io.BytesIO(file_bytes))
-        text = ""
+        reader = PdfReader(file_obj)
+        parts = []
+        total = 0
         for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
+            t = page.extract_text() or ""
+            parts.append(t)
+            total += len(t)
+            if total >= MAX_PROMPT_CHARS:
+                break
+        return "".join(parts)
     except Exception as e:
         raise ValueError(f"Failed to extract text from PDF: {str(e)}")
 
 
-def extract_text_from_docx(file_bytes: bytes) -> str:
+def extract_text_from_docx(file_obj: IO[bytes]) -> str:
     """Extract text from DOCX using python-docx."""
     try:
-        doc = Document(io.BytesIO(file_bytes))
-        text = "\n".join([para.text for para in doc.paragraphs])
+        doc = Document(file_obj)
+        parts = []
+        total = 0
+        for para in doc.paragraphs:
+            parts.append(para.text)
+            total += len(para.text) + 1
+            if total >= MAX_PROMPT_CHARS:
+                break
+        text = "\n".join(parts)
     except Exception as e:
         raise ValueError(f"Failed to extract text from DOCX: {str(e)}")
-    
+
     return text
 
 
-def extract_text(file_bytes: bytes, filename: str) -> str:
-    """Extract text from uploaded file based on extension."""
+def extract_text(file_obj: IO[bytes], filename: str) -> str:
+    """Extract text from an uploaded file object based on extension."""
     filename_lower = filename.lower()
-    
+
     if filename_lower.endswith('.pdf'):
-        return extract_text_from_pdf(file_bytes)
+        return extract_text_from_pdf(file_obj)
     elif filename_lower.endswith('.docx'):
-        return extract_text_from_docx(file_bytes)
-    elif filename_lower.endswith('.txt'):
-        return file_bytes.decode('utf-8', errors='ignore')
+        return extract_text_from_docx(file_obj)
     else:
-        # Try as plain text
-        return file_bytes.decode('utf-8', errors='ignore')
+        # .txt, or anything else: try as plain text
+        file_obj.seek(0)
+        return file_obj.read().decode('utf-8', errors='ignore')
 
 
 ANALYSIS_PROMPT = """You are a contract analysis expert helping content creators understand influencer/brand collaboration contracts. 
@@ -122,44 +194,109 @@ Respond in this exact JSON format:
 Only return valid JSON, no markdown formatting or code blocks."""
 
 
+_CLASSIFY_PROMPT = """Is the following document a contract, deal, agreement, or business proposal? Answer with exactly one word: "yes" or "no". If no, follow with a comma and a 2-4 word description of what the document appears to be (example: "no, cooking recipe").
+
+DOCUMENT:
+{snippet}"""
+
+
+async def _classify_document(snippet: str) -> Optional[Dict[str, Any]]:
+    """
+    Cheap yes/no contract check on a document prefix.
+    Returns a not_a_contract dict, or None if it is a contract (or the
+    check itself fails - the full analysis then decides).
+    """
+    try:
+        response = await _model.generate_content_async(_CLASSIFY_PROMPT.format(snippet=snippet))
+        answer = response.text.strip().lower()
+    except Exception:
+        return None
+
+    if answer.startswith("no"):
+        doc_type = answer.partition(",")[2].strip() or "random document"
+        return {"not_a_contract": True, "document_type": doc_type}
+    return None
+
+
+async def _run_gemini_analysis(contract_text: str, country: str) -> Dict[str, Any]:
+    """Send the contract text to Gemini and parse the JSON analysis."""
+    # Prepare the prompt
+    prompt = ANALYSIS_PROMPT.format(
+        country=country,
+        contract_text=contract_text[:MAX_PROMPT_CHARS]  # Limit to avoid token limits
+    )
+
+    # Fan out: race a tiny classification call on the first 2 KB against the
+    # full analysis. Non-contract uploads (the common prank/user-error path)
+    # come back from the small call in well under a second, letting us skip
+    # waiting on - and paying for - the big prompt.
+    classify_task = asyncio.create_task(_classify_document(contract_text[:2000]))
+    analysis_task = asyncio.create_task(_model.generate_content_async(prompt))
+
+    verdict = await classify_task
+    if verdict is not None:
+        analysis_task.cancel()
+        return verdict
+
+    response = await analysis_task
+
+    # Parse response - slicing between the outermost braces also strips any
+    # markdown code fences Gemini wraps around the JSON
+    response_text = response.text
+    start = response_text.find('{')
+    end = response_text.rfind('}') + 1
+    if start == -1 or end == 0:
+        raise ValueError("Failed to parse Gemini response: no JSON object found")
+
+    try:
+        return orjson.loads(response_text[start:end])
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"Failed to parse Gemini response: {str(e)}")
+
+
 async def analyze_contract(
-    file_bytes: bytes, 
-    filename: str, 
+    file_obj: IO[bytes],
+    filename: str,
     country: str = "United States"
 ) -> Dict[str, Any]:
     """
     Analyze a contract using Gemini 2.5 Flash.
     Returns structured analysis with risk scores and recommendations.
     """
-    # Extract text from file
-    contract_text = extract_text(file_bytes, filename)
+    # Extract text off the event loop - PDF/DOCX parsing is blocking and
+    # can take seconds for multi-page contracts
+    contract_text = await anyio.to_thread.run_sync(extract_text, file_obj, filename)
     
     if not contract_text or len(contract_text.strip()) < 50:
         raise ValueError("Could not extract enough text from the contract. Please try a different file format.")
-    
-    # Prepare the prompt
-    prompt = ANALYSIS_PROMPT.format(
-        country=country,
-        contract_text=contract_text[:15000]  # Limit to avoid token limits
-    )
-    
-    # Call Gemini
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    response = model.generate_content(prompt)
-    
-    # Parse response
-    response_text = response.text.strip()
-    
-    # Clean up response if wrapped in markdown code blocks
-    if response_text.startswith("```"):
-        response_text = re.sub(r'^```json?\s*', '', response_text)
-        response_text = re.sub(r'\s*```$', '', response_text)
-    
+
+    # Dedupe identical contracts: hash the prompt-relevant text + country and
+    # reuse the cached analysis instead of paying for another Gemini call.
+    # The per-key lock makes concurrent duplicate uploads share one call.
+    cache_key = hashlib.blake2b(
+        f"{country}\n{contract_text[:MAX_PROMPT_CHARS]}".encode(),
+        digest_size=16
+    ).hexdigest()
+    entry = _analysis_locks.setdefault(cache_key, [asyncio.Lock(), 0])
+    entry[1] += 1
     try:
-        analysis = json.loads(response_text)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Failed to parse Gemini response: {str(e)}")
-    
+        async with entry[0]:
+            analysis = _ANALYSIS_CACHE.get(cache_key)
+            if analysis is None:
+                analysis = await _run_gemini_analysis(contract_text, country)
+                _ANALYSIS_CACHE[cache_key] = analysis
+    finally:
+        # Drop the entry only when the last user leaves - popping with
+        # waiters still queued would let a new duplicate get a fresh lock
+        # and run Gemini alongside them. Runs on every path so failed
+        # Gemini calls can't leak entries either.
+        entry[1] -= 1
+        if entry[1] == 0:
+            _analysis_locks.pop(cache_key, None)
+
+    # Shallow copy so callers adding metadata don't mutate the cached entry
+    analysis = dict(analysis)
+
     # Check if this is not a contract - return funny prank response
     if analysis.get("not_a_contract"):
         doc_type = analysis.get("document_type", "random document")
@@ -205,27 +342,27 @@ Write ONLY the email body (no subject line). Keep it under 200 words. Be profess
 
 async def generate_negotiation_email(analysis: Dict[str, Any]) -> str:
     """Generate a negotiation email based on contract analysis."""
-    # Filter to only include concerning clauses
-    concerning_clauses = [
-        c for c in analysis.get("clauses", [])
-        if c.get("risk_level") in ["yellow", "red"]
-    ]
-    
+    # Filter to the top 5 concerning clauses in a single pass
+    concerning_clauses = list(itertools.islice(
+        (c for c in analysis.get("clauses", []) if c.get("risk_level") in ("yellow", "red")),
+        5
+    ))
+
     if not concerning_clauses:
         return "Great news! This contract looks pretty standard and doesn't have major red flags. You may not need to negotiate, but always feel free to ask clarifying questions!"
-    
+
     # Prepare analysis summary for prompt
     analysis_for_prompt = {
         "summary": analysis.get("summary", {}),
-        "concerning_clauses": concerning_clauses[:5],  # Top 5 concerns
+        "concerning_clauses": concerning_clauses,
         "next_steps": analysis.get("next_steps", [])
     }
-    
+
+    # Compact JSON - indentation just inflates the prompt's token count
     prompt = NEGOTIATION_EMAIL_PROMPT.format(
-        analysis_json=json.dumps(analysis_for_prompt, indent=2)
+        analysis_json=orjson.dumps(analysis_for_prompt).decode()
     )
     
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    response = model.generate_content(prompt)
-    
+    response = await _model.generate_content_async(prompt)
+
     return response.text.strip()
@@ -4,8 +4,14 @@ Stores data in ./data directory as JSON files.
 """
 import os
 import json
+import threading
 import uuid
-from datetime import datetime
+
+import aiofiles
+import orjson
+from collections import OrderedDict
+from datetime import datetime, timezone
+from operator import itemgetter
 from pathlib import Path
 from typing import Optional, Dict, Any
 
@@ -13,55 +19,107 @@ from app.config import get_settings
 
 settings = get_settings()
 
+# Created once at import - every storage call used to re-stat/mkdir it
+_DATA_DIR = Path(settings.data_dir)
+_DATA_DIR.mkdir(exist_ok=True)
+
+# In-memory index of analysis metadata so listing doesn't re-open and
+# parse every JSON file per request. Loaded lazily, updated on save.
+_INDEX: Dict[str, Dict[str, Any]] = {}
+_index_lock = threading.Lock()
+_index_loaded = False
+
+# LRU of full analyses for get_analysis - the frontend fetches an analysis
+# right after creating it, so serve repeat GETs from memory instead of
+# re-reading and re-parsing the file
+_GET_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_GET_CACHE_MAX = 512
+_get_cache_lock = threading.Lock()
+
+
+def _cache_analysis(analysis_id: str, analysis: Dict[str, Any]) -> None:
+    """Insert into the GET cache, evicting the oldest entry past the cap."""
+    with _get_cache_lock:
+        _GET_CACHE[analysis_id] = analysis
+        _GET_CACHE.move_to_end(analysis_id)
+        if len(_GET_CACHE) > _GET_CACHE_MAX:
+            _GET_CACHE.popitem(last=False)
+
 
 def get_data_dir() -> Path:
-    """Get the data directory, creating it if it doesn't exist."""
-    data_dir = Path(settings.data_dir)
-    data_dir.mkdir(exist_ok=True)
-    return data_dir
+    """Get the data directory (created at import time)."""
+    return _DATA_DIR
+
+
+def _index_entry(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Project the four fields the list endpoint needs."""
+    return {
+        "id": data.get("id"),
+        "created_at": data.get("created_at") or "",
+        "filename": data.get("filename"),
+        "summary": data.get("summary", {})
+    }
+
 
+def _load_index() -> None:
+    """Scan the data dir once and build the metadata index."""
+    global _index_loaded
+    with _index_lock:
+        if _index_loaded:
+            return
+        for file_path in get_data_dir().glob("*.json"):
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception:
+                continue
+            _INDEX[data.get("id") or file_path.stem] = _index_entry(data)
+        _index_loaded = True
 
-def save_analysis(analysis: Dict[str, Any]) -> str:
+
+async def save_analysis(analysis: Dict[str, Any]) -> str:
     """Save an analysis to a JSON file. Returns the analysis ID."""
     analysis_id = str(uuid.uuid4())
     analysis["id"] = analysis_id
-    analysis["created_at"] = datetime.utcnow().isoformat()
-    
+    analysis["created_at"] = datetime.now(timezone.utc).isoformat()
+
+    # Write via aiofiles so the event loop isn't stalled on disk I/O
     file_path = get_data_dir() / f"{analysis_id}.json"
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(analysis, f, indent=2, ensure_ascii=False)
-    
+    async with aiofiles.open(file_path, "wb") as f:
+        await f.write(orjson.dumps(analysis, option=orjson.OPT_INDENT_2))
+
+    _load_index()
+    with _index_lock:
+        _INDEX[analysis_id] = _index_entry(analysis)
+    _cache_analysis(analysis_id, analysis)
+
     return analysis_id
 
 
 def get_analysis(analysis_id: str) -> Optional[Dict[str, Any]]:
     """Retrieve an analysis by ID."""
+    with _get_cache_lock:
+        cached = _GET_CACHE.get(analysis_id)
+        if cached is not None:
+            _GET_CACHE.move_to_end(analysis_id)
+            return cached
+
     file_path = get_data_dir() / f"{analysis_id}.json"
     if not file_path.exists():
         return None
-    
+
     with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+        analysis = json.load(f)
+
+    _cache_analysis(analysis_id, analysis)
+    return analysis
 
 
 def list_analyses() -> list[Dict[str, Any]]:
-    """List all saved analyses (metadata only)."""
-    data_dir = get_data_dir()
-    analyses = []
-    
-    for file_path in data_dir.glob("*.json"):
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                analyses.append({
-                    "id": data.get("id"),
-                    "created_at": data.get("created_at"),
-                    "filename": data.get("filename"),
-                    "summary": data.get("summary", {})
-                })
-        except Exception:
-            continue
-    
-    # Sort by created_at descending
-    analyses.sort(key=lambda x: x.get("created_at", ""), reverse=True)
+    """List all saved analyses (metadata only), newest first."""
+    _load_index()
+    with _index_lock:
+        analyses = list(_INDEX.values())
+
+    analyses.sort(key=itemgetter("created_at"), reverse=True)
     return analyses